@@ -1,13 +1,24 @@
 import streamlit as st
 import pandas as pd
 import gspread
+from gspread.utils import fill_gaps
 from google.oauth2.service_account import Credentials
 from datetime import date, datetime, timedelta
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import time
-from functools import wraps
+import random
+import io
+import threading
+from functools import cached_property, wraps
+from pathlib import Path
+from itertools import zip_longest
+
+MEMBER_HEADERS = ['Membership Number', 'Full Name', 'Group', 'Email', 'Phone']
+ATTENDANCE_HEADERS = ['Date', 'Membership Number', 'Full Name', 'Group', 'Status', 'Timestamp']
+RETRYABLE_STATUS = {429, 500, 502, 503}  # Quota and transient server errors
+DISK_CACHE_VERSION = 1  # Bump when the cached frame layout changes
 
 # Page configuration
 st.set_page_config(
@@ -54,31 +65,28 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-def rate_limit(delay=1.0):
-    """Decorator to add rate limiting to API calls"""
+def rate_limit(max_retries=5):
+    """Decorator to pace API calls through the manager's token bucket, retrying quota and server errors"""
     def decorator(func):
         @wraps(func)
         def wrapper(self, *args, **kwargs):
-            # Check last call time
-            current_time = time.time()
-            if hasattr(self, '_last_api_call'):
-                time_since_last = current_time - self._last_api_call
-                if time_since_last < delay:
-                    time.sleep(delay - time_since_last)
-            
-            try:
-                result = func(self, *args, **kwargs)
-                self._last_api_call = time.time()
-                return result
-            except gspread.exceptions.APIError as e:
-                if "Quota exceeded" in str(e):
-                    st.warning("⏳ API rate limit reached. Waiting 60 seconds...")
-                    time.sleep(60)
-                    result = func(self, *args, **kwargs)
-                    self._last_api_call = time.time()
-                    return result
-                else:
-                    raise e
+            for attempt in range(max_retries + 1):
+                # Wait for a token so bursts stay under the per-minute quota
+                self._acquire_token()
+                try:
+                    return func(self, *args, **kwargs)
+                except gspread.exceptions.APIError as e:
+                    status = e.response.status_code
+                    if status not in RETRYABLE_STATUS or attempt == max_retries:
+                        raise e
+                    
+                    # Wait as long as the server asks, else back off exponentially with jitter
+                    retry_after = e.response.headers.get('Retry-After')
+                    wait = float(retry_after) if retry_after and retry_after.isdigit() else min(2 ** (attempt + 1), 32) + random.random()
+                    if status == 429:
+                        self._drain_tokens()  # Other sessions back off too
+                        st.warning(f"⏳ API rate limit reached. Retrying in {wait:.0f} seconds...")
+                    time.sleep(wait)
         return wrapper
     return decorator
 
@@ -86,24 +94,34 @@ class GoogleSheetsManager:
     def __init__(self):
         self.client = None
         self.spreadsheet = None
-        self.members_sheet = None
-        self.attendance_sheet = None
-        self._last_api_call = 0
+        self._worksheets = None
+        self._sheets_lock = threading.Lock()
+        self._bucket = {'tokens': 60.0, 'capacity': 60.0, 'refill_per_s': 1.0, 'updated': time.time()}
+        self._bucket_lock = threading.Lock()  # Sheets allows 60 requests/minute per user
         self._cache = {}
+        self._cache_stats = {'hits': 0, 'misses': 0}  # Page loads served from cache vs. the API
+        self._write_lock = threading.Lock()  # Manager is shared by all sessions
+        self._pending_attendance = []  # Saves not yet folded into the cache
         self._cache_timeout = 300  # 5 minutes
+        self._stats_timeout = 60  # Column counts are cheap, refresh sooner
+        self._disk_cache_dir = Path(".streamlit_cache")  # Survives server restarts
         self.initialize_connection()
+        
+        # Recently confirmed snapshots from before a restart need no API call
+        if self.is_connected():
+            self._restore_disk_cache(self._get_cache_key("load_members"), self._get_cache_key("load_attendance"))
     
     def _get_cache_key(self, method_name, *args):
         """Generate cache key for method calls"""
         return f"{method_name}_{hash(str(args))}"
     
-    def _is_cache_valid(self, cache_key):
+    def _is_cache_valid(self, cache_key, timeout=None):
         """Check if cached data is still valid"""
         if cache_key not in self._cache:
             return False
         
         cached_time = self._cache[cache_key].get('timestamp', 0)
-        return (time.time() - cached_time) < self._cache_timeout
+        return (time.time() - cached_time) < (timeout or self._cache_timeout)
     
     def _set_cache(self, cache_key, data):
         """Set data in cache with timestamp"""
@@ -116,6 +134,122 @@ class GoogleSheetsManager:
         """Get data from cache"""
         return self._cache[cache_key]['data']
     
+    def _refill_tokens(self):
+        """Add the tokens earned since the last update (caller holds the bucket lock)"""
+        now = time.time()
+        bucket = self._bucket
+        bucket['tokens'] = min(bucket['capacity'], bucket['tokens'] + (now - bucket['updated']) * bucket['refill_per_s'])
+        bucket['updated'] = now
+    
+    def _acquire_token(self):
+        """Take one API call token, sleeping until it is available"""
+        with self._bucket_lock:
+            self._refill_tokens()
+            # Reserve now (the balance may go negative) so concurrent callers queue up
+            self._bucket['tokens'] -= 1
+            wait = -self._bucket['tokens'] / self._bucket['refill_per_s']
+        if wait > 0:
+            time.sleep(wait)
+    
+    def _drain_tokens(self):
+        """Empty the bucket after a quota error so every caller slows down"""
+        with self._bucket_lock:
+            self._refill_tokens()
+            self._bucket['tokens'] = min(self._bucket['tokens'], 0.0)
+    
+    def get_bucket_state(self):
+        """Get the available API call tokens and the wait before the next call"""
+        with self._bucket_lock:
+            self._refill_tokens()
+            tokens = self._bucket['tokens']
+        return {
+            'tokens': max(tokens, 0.0),
+            'wait': max(0.0, (1 - tokens) / self._bucket['refill_per_s'])
+        }
+    
+    def _get_derived_cache(self, method_name, source, build):
+        """Get data derived from a loaded frame, rebuilt only when the frame is reloaded"""
+        cache_key = self._get_cache_key(method_name)
+        cached = self._cache.get(cache_key)
+        if cached is None or cached['data'][0] is not source:
+            self._set_cache(cache_key, (source, build(source)))
+        return self._get_cache(cache_key)[1]
+    
+    def _get_modified_time(self):
+        """Get the spreadsheet's Drive modified time (one cheap metadata request)"""
+        try:
+            return self.spreadsheet.get_lastUpdateTime()
+        except Exception:
+            return None
+    
+    def _disk_cache_path(self, name, modified_time):
+        """Path of a sheet's parquet snapshot for one spreadsheet revision"""
+        stamp = "".join(c for c in modified_time if c.isalnum())
+        return self._disk_cache_dir / f"{name}_{self.spreadsheet.id}_v{DISK_CACHE_VERSION}_{stamp}.parquet"
+    
+    def _read_disk_cache(self, name, modified_time):
+        """Read a sheet snapshot saved at this modified time, if there is one"""
+        if modified_time is None:
+            return None
+        
+        path = self._disk_cache_path(name, modified_time)
+        try:
+            if not path.exists():
+                return None
+            path.touch()  # Confirmed current; restarts can skip the check for a while
+            return pd.read_parquet(path)
+        except Exception:
+            return None
+    
+    def _restore_disk_cache(self, members_key, attendance_key):
+        """Restore the newest snapshot pair confirmed within the cache timeout, with no API call at all"""
+        try:
+            # Both sheets must come from the same spreadsheet revision
+            members_paths = self._disk_cache_dir.glob(f"members_{self.spreadsheet.id}_v{DISK_CACHE_VERSION}_*.parquet")
+            members_path = max(members_paths, key=lambda path: path.stat().st_mtime)
+            attendance_path = members_path.with_name("attendance" + members_path.name[len("members"):])
+            confirmed_time = min(members_path.stat().st_mtime, attendance_path.stat().st_mtime)
+            if time.time() - confirmed_time >= self._cache_timeout:
+                return False
+            members_df = pd.read_parquet(members_path)
+            attendance_df = pd.read_parquet(attendance_path)
+        except Exception:
+            return False  # No snapshot pair (max of an empty glob raises too)
+        
+        # Keep the confirmation time so the data ages as if it stayed in memory
+        self._cache[members_key] = {'data': members_df, 'timestamp': confirmed_time}
+        self._cache[attendance_key] = {'data': attendance_df, 'timestamp': confirmed_time}
+        return True
+    
+    def _write_disk_cache(self, name, modified_time, df):
+        """Replace a sheet's snapshot on disk"""
+        if modified_time is None:
+            return
+        
+        try:
+            self._clear_disk_cache(name)
+            self._disk_cache_dir.mkdir(exist_ok=True)
+            df.to_parquet(self._disk_cache_path(name, modified_time), index=False)
+        except Exception:
+            pass  # The snapshot is only a shortcut; the sheet stays the source of truth
+    
+    def _clear_disk_cache(self, name):
+        """Delete a sheet's snapshots so the next cold load reads the sheet"""
+        try:
+            for path in self._disk_cache_dir.glob(f"{name}_{self.spreadsheet.id}_*.parquet"):
+                path.unlink(missing_ok=True)
+        except OSError:
+            pass
+    
+    def clear_cache(self):
+        """Drop all cached data, including the disk snapshots, so the next load re-downloads"""
+        with self._write_lock:
+            self._cache.clear()
+            self._pending_attendance = []
+            if self.is_connected():
+                self._clear_disk_cache("members")
+                self._clear_disk_cache("attendance")
+    
     def initialize_connection(self):
         """Initialize Google Sheets connection"""
         try:
@@ -135,16 +269,7 @@ class GoogleSheetsManager:
             
             # Open or create spreadsheet
             spreadsheet_name = st.secrets.get("spreadsheet_name", "Church Attendance System")
-            
-            try:
-                self.spreadsheet = self.client.open(spreadsheet_name)
-            except gspread.SpreadsheetNotFound:
-                # Create new spreadsheet if it doesn't exist
-                self.spreadsheet = self.client.create(spreadsheet_name)
-                st.info(f"✅ Created new spreadsheet: {spreadsheet_name}")
-            
-            # Get or create worksheets
-            self.setup_worksheets()
+            self.spreadsheet = self._open_spreadsheet(spreadsheet_name)
             
         except Exception as e:
             st.error(f"""
@@ -159,153 +284,330 @@ class GoogleSheetsManager:
             """)
             self.client = None
     
-    @rate_limit(1.5)  # 1.5 second delay between API calls
-    def setup_worksheets(self):
-        """Setup required worksheets"""
+    @rate_limit()
+    def _open_spreadsheet(self, spreadsheet_name):
+        """Open the spreadsheet, creating it if needed (retried so a startup 429 doesn't disconnect the app)"""
         try:
-            # Members worksheet
-            try:
-                self.members_sheet = self.spreadsheet.worksheet("Members")
-            except gspread.WorksheetNotFound:
-                self.members_sheet = self.spreadsheet.add_worksheet(
-                    title="Members", rows=1000, cols=10
-                )
-                # Add headers
-                time.sleep(1)  # Additional delay for worksheet creation
-                self.members_sheet.update('A1:E1', [[
-                    'Membership Number', 'Full Name', 'Group', 'Email', 'Phone'
-                ]])
+            return self.client.open(spreadsheet_name)
+        except gspread.SpreadsheetNotFound:
+            # Create new spreadsheet if it doesn't exist
+            spreadsheet = self.client.create(spreadsheet_name)
+            st.info(f"✅ Created new spreadsheet: {spreadsheet_name}")
+            return spreadsheet
+    
+    @cached_property
+    def members_sheet(self):
+        """Members worksheet, looked up on first use"""
+        return self._get_worksheets()["Members"]
+    
+    @cached_property
+    def attendance_sheet(self):
+        """Attendance worksheet, looked up on first use"""
+        return self._get_worksheets()["Attendance"]
+    
+    def _get_worksheets(self):
+        """Get both worksheets by title, opened together once"""
+        with self._sheets_lock:  # The manager is shared by concurrent sessions
+            if self._worksheets is None:
+                self._worksheets = self._open_worksheets()
+        return self._worksheets
+    
+    @rate_limit()
+    def _open_worksheets(self):
+        """Get the required worksheets, creating any missing ones in one batch"""
+        layout = {"Members": (MEMBER_HEADERS, 1000), "Attendance": (ATTENDANCE_HEADERS, 10000)}
+        
+        worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+        missing = [title for title in layout if title not in worksheets]
+        
+        if missing:
+            self.spreadsheet.batch_update({'requests': [
+                {
+                    'addSheet': {
+                        'properties': {
+                            'title': title,
+                            'gridProperties': {'rowCount': layout[title][1], 'columnCount': 10}
+                        }
+                    }
+                }
+                for title in missing
+            ]})
             
-            # Attendance worksheet
-            try:
-                self.attendance_sheet = self.spreadsheet.worksheet("Attendance")
-            except gspread.WorksheetNotFound:
-                self.attendance_sheet = self.spreadsheet.add_worksheet(
-                    title="Attendance", rows=10000, cols=10
-                )
-                # Add headers
-                time.sleep(1)  # Additional delay for worksheet creation
-                self.attendance_sheet.update('A1:F1', [[
-                    'Date', 'Membership Number', 'Full Name', 'Group', 'Status', 'Timestamp'
-                ]])
-                
-        except Exception as e:
-            st.error(f"Error setting up worksheets: {str(e)}")
+            # Add headers to all new sheets in one request
+            self.spreadsheet.values_batch_update({
+                'valueInputOption': 'RAW',
+                'data': [{'range': f"{title}!A1", 'values': [layout[title][0]]} for title in missing]
+            })
+            worksheets = {worksheet.title: worksheet for worksheet in self.spreadsheet.worksheets()}
+        
+        return worksheets
+    
+    @staticmethod
+    def _cell_rows(rows):
+        """Wrap rows of values as literal (RAW) string cells for a batchUpdate"""
+        return [{'values': [{'userEnteredValue': {'stringValue': str(value)}} for value in row]} for row in rows]
+    
+    @classmethod
+    def _update_request(cls, worksheet, row_number, rows):
+        """Request overwriting rows in place, starting at a 1-based row"""
+        return {
+            'updateCells': {
+                'start': {'sheetId': worksheet.id, 'rowIndex': row_number - 1, 'columnIndex': 0},
+                'rows': cls._cell_rows(rows),
+                'fields': 'userEnteredValue'
+            }
+        }
+    
+    @classmethod
+    def _append_request(cls, worksheet, rows):
+        """Request appending rows after the worksheet's last row with data"""
+        return {
+            'appendCells': {
+                'sheetId': worksheet.id,
+                'rows': cls._cell_rows(rows),
+                'fields': 'userEnteredValue'
+            }
+        }
+    
+    @staticmethod
+    def _delete_requests(worksheet, row_numbers):
+        """Requests deleting the given 1-based rows from a worksheet"""
+        # Collapse consecutive rows into ranges
+        ranges = []
+        for row_number in sorted(set(row_numbers)):
+            if ranges and ranges[-1][1] == row_number - 1:
+                ranges[-1][1] = row_number
+            else:
+                ranges.append([row_number, row_number])
+        
+        # Delete bottom-up so earlier row numbers stay valid
+        return [
+            {
+                'deleteDimension': {
+                    'range': {
+                        'sheetId': worksheet.id,
+                        'dimension': 'ROWS',
+                        'startIndex': start - 1,
+                        'endIndex': end
+                    }
+                }
+            }
+            for start, end in reversed(ranges)
+        ]
     
     def is_connected(self):
         """Check if Google Sheets is connected"""
         return self.client is not None and self.spreadsheet is not None
     
-    @rate_limit(1.0)
-    def load_members(self, use_cache=True):
+    def load_members(self, use_cache=True, track_stats=True):
         """Load members from Google Sheets with caching"""
         if not self.is_connected():
             return pd.DataFrame()
         
         cache_key = self._get_cache_key("load_members")
         
-        # Use cache if valid and requested
+        # Use cache if valid and requested (no API call on cache hits)
         if use_cache and self._is_cache_valid(cache_key):
+            if track_stats:
+                self._cache_stats['hits'] += 1
             return self._get_cache(cache_key)
         
+        if track_stats:
+            self._cache_stats['misses'] += 1
         try:
             with st.spinner("Loading members from Google Sheets..."):
-                data = self.members_sheet.get_all_records()
-                df = pd.DataFrame(data)
-                
-                # Clean empty rows
-                if not df.empty:
-                    df = df[df['Membership Number'].astype(str).str.strip() != '']
-                
-                # Cache the result
-                self._set_cache(cache_key, df)
-                return df
-                
+                return self._fetch_members(cache_key)
         except Exception as e:
             st.error(f"Error loading members: {str(e)}")
             return pd.DataFrame()
     
-    @rate_limit(2.0)  # Longer delay for write operations
+    def _fetch_members(self, cache_key):
+        """Fetch members from Google Sheets and cache the result"""
+        # Reuse the on-disk snapshot if the spreadsheet hasn't changed
+        modified_time = self._get_modified_time()
+        df = self._read_disk_cache("members", modified_time)
+        if df is None:
+            df = self._download_members(modified_time)
+        
+        # Cache the result
+        self._set_cache(cache_key, df)
+        return df
+    
+    @rate_limit()
+    def _download_members(self, modified_time):
+        """Download the members sheet and snapshot it for this modified time"""
+        df = self._build_members(self.members_sheet.get_all_values())
+        self._write_disk_cache("members", modified_time, df)
+        return df
+    
+    def load_all(self):
+        """Load members and attendance, downloading both stale sheets in one request"""
+        if not self.is_connected():
+            return pd.DataFrame(), pd.DataFrame()
+        
+        members_key = self._get_cache_key("load_members")
+        attendance_key = self._get_cache_key("load_attendance")
+        
+        # Only one stale sheet is a single request anyway
+        if self._is_cache_valid(members_key) or self._is_cache_valid(attendance_key):
+            return self.load_members(), self.load_attendance()
+        
+        # A fresh download includes the saves queued so far, but not ones
+        # queued by other sessions while it runs
+        included = self._snapshot_pending_attendance()
+        
+        self._cache_stats['misses'] += 2
+        try:
+            with st.spinner("Loading data from Google Sheets..."):
+                result = self._fetch_all(members_key, attendance_key)
+            self._discard_pending_attendance(included)
+            return result
+        except Exception as e:
+            st.error(f"Error loading data: {str(e)}")
+            return pd.DataFrame(), pd.DataFrame()
+    
+    def _fetch_all(self, members_key, attendance_key):
+        """Fetch both sheets with one values batchGet and cache the results"""
+        # Reuse the on-disk snapshots if the spreadsheet hasn't changed
+        modified_time = self._get_modified_time()
+        members_df = self._read_disk_cache("members", modified_time)
+        attendance_df = self._read_disk_cache("attendance", modified_time)
+        
+        if members_df is None and attendance_df is None:
+            members_values, attendance_values = self._fetch_columns(
+                [self.members_sheet.title, self.attendance_sheet.title]
+            )
+            members_df = self._build_members(members_values)
+            attendance_df = self._build_attendance(attendance_values)
+            self._write_disk_cache("members", modified_time, members_df)
+            self._write_disk_cache("attendance", modified_time, attendance_df)
+        elif members_df is None:
+            members_df = self._download_members(modified_time)
+        elif attendance_df is None:
+            attendance_df = self._download_attendance(modified_time)
+        
+        # Cache the results
+        self._set_cache(members_key, members_df)
+        self._set_cache(attendance_key, attendance_df)
+        return members_df, attendance_df
+    
     def save_members(self, df):
-        """Save members to Google Sheets"""
+        """Save members to Google Sheets, writing only the rows that changed"""
         if not self.is_connected():
             return False
         
         try:
             with st.spinner("Saving members to Google Sheets..."):
-                # Clear existing data (except headers)
-                self.members_sheet.clear()
-                time.sleep(1)  # Wait after clear
-                
-                # Add headers
-                headers = ['Membership Number', 'Full Name', 'Group', 'Email', 'Phone']
-                self.members_sheet.update('A1:E1', [headers])
-                time.sleep(1)  # Wait after header update
-                
-                # Prepare data in batches
-                data = []
-                for _, row in df.iterrows():
-                    data.append([
-                        str(row.get('Membership Number', '')),
-                        str(row.get('Full Name', '')),
-                        str(row.get('Group', '')),
-                        str(row.get('Email', '')),
-                        str(row.get('Phone', ''))
-                    ])
-                
-                # Update sheet in batches of 100 rows
-                if data:
-                    batch_size = 100
-                    for i in range(0, len(data), batch_size):
-                        batch = data[i:i + batch_size]
-                        start_row = i + 2
-                        end_row = start_row + len(batch) - 1
-                        range_name = f'A{start_row}:E{end_row}'
-                        
-                        self.members_sheet.update(range_name, batch)
-                        
-                        # Add delay between batches
-                        if i + batch_size < len(data):
-                            time.sleep(2)
-                
-                # Clear cache
-                self._cache.clear()
-                return True
-                
+                return self._write_members(df)
         except Exception as e:
             st.error(f"Error saving members: {str(e)}")
             return False
     
-    @rate_limit(1.0)
-    def load_attendance(self, use_cache=True):
+    @rate_limit()
+    def _write_members(self, df):
+        """Diff members against the sheet and write the changes (safe to retry)"""
+        with self._write_lock:
+            # Read the sheet once and index existing rows by Membership Number
+            values = self.members_sheet.get_all_values()
+            existing = {}
+            stale_rows = []
+            for row_number, row in enumerate(values[1:], start=2):
+                number = row[0].strip() if row else ''
+                if not number:
+                    continue
+                if number in existing:
+                    # Duplicate member row - keep the last one only
+                    stale_rows.append(existing[number][0])
+                existing[number] = (row_number, (row + [''] * len(MEMBER_HEADERS))[:len(MEMBER_HEADERS)])
+            
+            # Prepare new rows keyed by Membership Number (vectorized conversion)
+            new_df = df.reindex(columns=MEMBER_HEADERS).fillna('').astype(str)
+            new_df['Membership Number'] = new_df['Membership Number'].str.strip()
+            new_df = new_df[new_df['Membership Number'] != '']
+            new_rows = dict(zip(new_df['Membership Number'], new_df.values.tolist()))
+            
+            # Diff against the sheet
+            requests = []
+            additions = []
+            if not values or values[0][:len(MEMBER_HEADERS)] != MEMBER_HEADERS:
+                requests.append(self._update_request(self.members_sheet, 1, [MEMBER_HEADERS]))
+            
+            for number, data in new_rows.items():
+                if number in existing:
+                    row_number, current = existing[number]
+                    if current != data:
+                        requests.append(self._update_request(self.members_sheet, row_number, [data]))
+                else:
+                    additions.append(data)
+            
+            deleted_rows = stale_rows + [existing[number][0] for number in existing.keys() - new_rows.keys()]
+            
+            # Update changed rows in place, then delete removed members (row
+            # numbers are still the ones read above), then append new members
+            requests += self._delete_requests(self.members_sheet, deleted_rows)
+            if additions:
+                requests.append(self._append_request(self.members_sheet, additions))
+            
+            # One atomic request for the whole change, so a retry never
+            # finds it half applied
+            if requests:
+                self.spreadsheet.batch_update({'requests': requests})
+            
+            # Only the members data is stale now
+            self._clear_disk_cache("members")
+            self._cache.pop(self._get_cache_key("load_members"), None)
+            self._cache.pop(self._get_cache_key("stats_counts"), None)
+            return True
+    
+    def load_attendance(self, use_cache=True, track_stats=True):
         """Load attendance from Google Sheets with caching"""
         if not self.is_connected():
             return pd.DataFrame()
         
         cache_key = self._get_cache_key("load_attendance")
         
-        # Use cache if valid and requested
+        # Use cache if valid and requested (no API call on cache hits)
         if use_cache and self._is_cache_valid(cache_key):
-            return self._get_cache(cache_key)
+            df = self._apply_pending_attendance(cache_key)
+            if df is not None:
+                if track_stats:
+                    self._cache_stats['hits'] += 1
+                return df
         
+        # A fresh download includes the saves queued so far, but not ones
+        # queued by other sessions while it runs
+        included = self._snapshot_pending_attendance()
+        
+        if track_stats:
+            self._cache_stats['misses'] += 1
         try:
             with st.spinner("Loading attendance from Google Sheets..."):
-                data = self.attendance_sheet.get_all_records()
-                df = pd.DataFrame(data)
-                
-                # Clean empty rows
-                if not df.empty:
-                    df = df[df['Date'].astype(str).str.strip() != '']
-                
-                # Cache the result
-                self._set_cache(cache_key, df)
-                return df
-                
+                df = self._fetch_attendance(cache_key)
+            self._discard_pending_attendance(included)
+            return df
         except Exception as e:
             st.error(f"Error loading attendance: {str(e)}")
             return pd.DataFrame()
     
-    @rate_limit(2.0)
+    def _fetch_attendance(self, cache_key):
+        """Fetch attendance from Google Sheets and cache the result"""
+        # Reuse the on-disk snapshot if the spreadsheet hasn't changed
+        modified_time = self._get_modified_time()
+        df = self._read_disk_cache("attendance", modified_time)
+        if df is None:
+            df = self._download_attendance(modified_time)
+        
+        # Cache the result
+        self._set_cache(cache_key, df)
+        return df
+    
+    @rate_limit()
+    def _download_attendance(self, modified_time):
+        """Download the attendance sheet and snapshot it for this modified time"""
+        df = self._build_attendance(self.attendance_sheet.get_all_values())
+        self._write_disk_cache("attendance", modified_time, df)
+        return df
+    
     def save_attendance(self, df, attendance_date, group_name):
         """Save attendance records to Google Sheets"""
         if not self.is_connected():
@@ -313,94 +615,240 @@ class GoogleSheetsManager:
         
         try:
             with st.spinner("Saving attendance to Google Sheets..."):
-                # Load existing data (without cache for accuracy)
-                existing_df = self.load_attendance(use_cache=False)
-                
-                # Remove existing records for this date/group
-                if not existing_df.empty:
-                    existing_df = existing_df[
-                        ~((existing_df['Date'] == attendance_date) & 
-                          (existing_df['Group'] == group_name))
-                    ]
-                
-                # Prepare new records
-                new_records = []
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-                
-                for _, row in df.iterrows():
-                    new_records.append({
-                        'Date': attendance_date,
-                        'Membership Number': str(row['Membership Number']),
-                        'Full Name': str(row['Full Name']),
-                        'Group': str(row['Group']),
-                        'Status': 'Present',
-                        'Timestamp': timestamp
-                    })
-                
-                # Combine with existing data
-                if not existing_df.empty:
-                    updated_df = pd.concat([existing_df, pd.DataFrame(new_records)], ignore_index=True)
-                else:
-                    updated_df = pd.DataFrame(new_records)
-                
-                # Clear and update sheet
-                self.attendance_sheet.clear()
-                time.sleep(1)  # Wait after clear
-                
-                # Add headers
-                headers = ['Date', 'Membership Number', 'Full Name', 'Group', 'Status', 'Timestamp']
-                self.attendance_sheet.update('A1:F1', [headers])
-                time.sleep(1)  # Wait after header update
-                
-                # Add data in batches
-                if not updated_df.empty:
-                    data = updated_df.values.tolist()
-                    batch_size = 100
-                    
-                    for i in range(0, len(data), batch_size):
-                        batch = data[i:i + batch_size]
-                        start_row = i + 2
-                        end_row = start_row + len(batch) - 1
-                        range_name = f'A{start_row}:F{end_row}'
-                        
-                        self.attendance_sheet.update(range_name, batch)
-                        
-                        # Add delay between batches
-                        if i + batch_size < len(data):
-                            time.sleep(2)
-                
-                # Clear cache
-                self._cache.clear()
-                return True
-                
+                return self._write_attendance(df, attendance_date, group_name)
         except Exception as e:
             st.error(f"Error saving attendance: {str(e)}")
             return False
     
+    @rate_limit()
+    def _write_attendance(self, df, attendance_date, group_name):
+        """Replace one date/group's attendance rows (safe to retry)"""
+        with self._write_lock:
+            # Find rows already recorded for this date/group, reading only
+            # the Date and Group columns
+            dates, groups = self.attendance_sheet.batch_get(['A:A', 'D:D'])
+            stale_rows = [
+                row_number
+                for row_number, (date_cell, group_cell) in enumerate(
+                    zip_longest(dates[1:], groups[1:], fillvalue=[]), start=2
+                )
+                if date_cell and group_cell
+                and date_cell[0] == attendance_date and group_cell[0] == group_name
+            ]
+            
+            # Prepare new rows directly in sheet column order
+            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            rows_df = df[['Membership Number', 'Full Name', 'Group']].astype(str)
+            rows_df.insert(0, 'Date', attendance_date)
+            new_rows = rows_df.assign(Status='Present', Timestamp=timestamp).values.tolist()
+            
+            # Remove the previous records for this date/group only, then
+            # append the new records instead of rewriting the sheet; an
+            # empty sheet gets its header row too
+            requests = self._delete_requests(self.attendance_sheet, stale_rows)
+            rows_to_append = new_rows if dates else [ATTENDANCE_HEADERS] + new_rows
+            if rows_to_append:
+                requests.append(self._append_request(self.attendance_sheet, rows_to_append))
+            
+            # One atomic request for both steps
+            if requests:
+                self.spreadsheet.batch_update({'requests': requests})
+            
+            # Write the change through to the cached attendance instead of
+            # forcing a full sheet download on the next page load
+            self._update_cached_attendance(attendance_date, group_name, new_rows)
+            self._clear_disk_cache("attendance")
+            self._cache.pop(self._get_cache_key("stats_counts"), None)
+            return True
+    
+    def _update_cached_attendance(self, attendance_date, group_name, new_rows):
+        """Queue one date/group's rows for the cached attendance frame"""
+        # Folded in on the next cached read, so a save never copies the history;
+        # queued even while the cache is stale in case a download is under way
+        self._pending_attendance.append((attendance_date, group_name, new_rows))
+    
+    def _snapshot_pending_attendance(self):
+        """Queued saves as of now, taken before a download starts"""
+        with self._write_lock:
+            return list(self._pending_attendance)
+    
+    def _discard_pending_attendance(self, included):
+        """Drop the queued saves a finished download already includes"""
+        included_ids = {id(entry) for entry in included}
+        with self._write_lock:
+            self._pending_attendance = [
+                entry for entry in self._pending_attendance if id(entry) not in included_ids
+            ]
+    
+    def _apply_pending_attendance(self, cache_key):
+        """Return the cached frame with queued saves folded in (one filter and one concat), or None if it was cleared"""
+        entry = self._cache.get(cache_key)
+        if entry is None:
+            return None
+        if not self._pending_attendance:
+            return entry['data']
+        
+        # Sessions folding at once must build on each other's result
+        with self._write_lock:
+            entry = self._cache.get(cache_key)
+            if entry is None:
+                return None
+            pending, self._pending_attendance = self._pending_attendance, []
+            if not pending:
+                return entry['data']
+            
+            # Later saves for the same date/group replace earlier ones
+            latest = {}
+            for attendance_date, group_name, new_rows in pending:
+                latest[(pd.Timestamp(attendance_date), group_name)] = new_rows
+            
+            df = entry['data']
+            if not df.empty:
+                replaced = pd.MultiIndex.from_frame(df[['Date', 'Group']]).isin(list(latest))
+                df = df[~replaced]
+            
+            new_df = self._parse_attendance_dates(self._values_to_df(
+                [ATTENDANCE_HEADERS] + [row for rows in latest.values() for row in rows]
+            ))
+            
+            # Keep the original timestamp so other sessions' changes still show up
+            entry['data'] = self._categorize_attendance(pd.concat([df, new_df], ignore_index=True))
+            return entry['data']
+    
+    @staticmethod
+    def _values_to_df(values):
+        """Build a frame from one 2D values payload instead of a dict per row"""
+        if not values:
+            return pd.DataFrame()
+        
+        # Skip rows with a blank key (first) column before building the frame
+        values = fill_gaps([values[0]] + [row for row in values[1:] if row and row[0].strip()])
+        
+        # Arrow-backed strings: contiguous buffers instead of a Python object per cell
+        return pd.DataFrame(values[1:], columns=values[0]).astype('string[pyarrow]')
+    
+    @classmethod
+    def _build_members(cls, values):
+        """Build the members frame from the sheet's values"""
+        df = cls._values_to_df(values)
+        
+        # Categorical groups: per-group filters compare integer codes
+        if 'Group' in df.columns:
+            df['Group'] = df['Group'].astype('category')
+        return df
+    
+    @classmethod
+    def _build_attendance(cls, values):
+        """Build the attendance frame from the sheet's values"""
+        df = cls._values_to_df(values)
+        
+        # Parse dates once here so pages don't re-parse on every rerun
+        df = cls._parse_attendance_dates(df)
+        return cls._categorize_attendance(df)
+    
+    @staticmethod
+    def _parse_attendance_dates(df):
+        """Parse the ISO Date strings written by save_attendance"""
+        if 'Date' in df.columns:
+            df['Date'] = pd.to_datetime(df['Date'], format='%Y-%m-%d', errors='coerce')
+        return df
+    
+    @staticmethod
+    def _categorize_attendance(df):
+        """Store the repetitive text columns as categoricals (integer codes)"""
+        for column in ('Membership Number', 'Group', 'Status', 'Full Name'):
+            if column in df.columns:
+                df[column] = df[column].astype('category')
+        return df
+    
     def get_existing_attendance(self, attendance_date, group_name):
         """Get existing attendance for specific date and group"""
-        df = self.load_attendance()
+        df = self.load_attendance(track_stats=False)
         
         if df.empty:
             return []
         
-        existing = df[
-            (df['Date'] == attendance_date) & 
-            (df['Group'] == group_name)
-        ]
+        # Group names by (date, group) once per loaded frame so switching
+        # date/group is a dict lookup instead of a full boolean scan
+        index = self._get_derived_cache(
+            "attendance_index", df,
+            lambda data: {
+                key: names.tolist()
+                for key, names in data.groupby(['Date', 'Group'], observed=True)['Full Name']
+            }
+        )
+        
+        return list(index.get((pd.Timestamp(attendance_date), group_name), []))
+    
+    def get_members_by_group(self):
+        """Get members split by group, built once per loaded members frame"""
+        members_df = self.load_members(track_stats=False)
+        
+        if members_df.empty:
+            return {}
         
-        return existing['Full Name'].tolist()
+        return self._get_derived_cache(
+            "members_by_group", members_df,
+            lambda data: {
+                group: group_df.reset_index(drop=True)
+                for group, group_df in data.groupby('Group', sort=True, observed=True)
+            }
+        )
+    
+    def get_member_positions(self, group, group_df):
+        """Get a group frame's name -> row positions map, built once per frame object"""
+        def build(data):
+            positions = {}
+            for position, name in enumerate(data['Full Name'].tolist()):
+                positions.setdefault(name, []).append(position)
+            return positions
+        
+        # Keyed on the frame itself, so positions always index the frame they came from
+        return self._get_derived_cache(f"member_positions_{group}", group_df, build)
+    
+    def get_attendance_summary(self, compute):
+        """Get an aggregate of the loaded attendance, recomputed only when the frame changes"""
+        return self._get_derived_cache(f"summary_{compute.__name__}", self.load_attendance(track_stats=False), compute)
+    
+    @rate_limit()
+    def _fetch_columns(self, ranges, major_dimension='ROWS'):
+        """Fetch the given A1 ranges (or whole sheets) in a single values batchGet"""
+        response = self.spreadsheet.values_batch_get(ranges, params={'majorDimension': major_dimension})
+        return [value_range.get('values', []) for value_range in response.get('valueRanges', [])]
     
     def get_stats(self):
         """Get database statistics"""
         try:
-            members_df = self.load_members()
-            attendance_df = self.load_attendance()
+            members_valid = self._is_cache_valid(self._get_cache_key("load_members"))
+            attendance_valid = self._is_cache_valid(self._get_cache_key("load_attendance"))
+            
+            if members_valid and attendance_valid:
+                # Both sheets are already in memory
+                members_df = self.load_members(track_stats=False)
+                attendance_df = self.load_attendance(track_stats=False)
+                total_members = len(members_df)
+                total_attendance = len(attendance_df)
+                unique_dates = len(attendance_df['Date'].unique()) if not attendance_df.empty else 0
+            else:
+                # Counting only needs the key columns, not full sheet downloads;
+                # memoized so every rerun doesn't repeat the request
+                counts_key = self._get_cache_key("stats_counts")
+                if not self._is_cache_valid(counts_key, self._stats_timeout):
+                    # One list per column rather than one list per cell
+                    member_ids, dates = self._fetch_columns(['Members!A2:A', 'Attendance!A2:A'], 'COLUMNS')
+                    member_ids = member_ids[0] if member_ids else []
+                    dates = [value for value in (dates[0] if dates else []) if value.strip()]
+                    self._set_cache(counts_key, (
+                        sum(1 for number in member_ids if number.strip()),
+                        len(dates),
+                        len(set(dates))
+                    ))
+                total_members, total_attendance, unique_dates = self._get_cache(counts_key)
             
             stats = {
-                'total_members': len(members_df),
-                'total_attendance': len(attendance_df),
-                'unique_dates': len(attendance_df['Date'].unique()) if not attendance_df.empty else 0,
+                'total_members': total_members,
+                'total_attendance': total_attendance,
+                'unique_dates': unique_dates,
                 'spreadsheet_url': self.spreadsheet.url if self.spreadsheet else ''
             }
             
@@ -413,6 +861,132 @@ class GoogleSheetsManager:
 def get_sheets_manager():
     return GoogleSheetsManager()
 
+@st.cache_data(ttl=600, max_entries=20, show_spinner=False)
+def to_csv_bytes(df, index=False):
+    """Encode a DataFrame as CSV bytes, cached so reruns don't re-serialize"""
+    buffer = io.BytesIO()
+    df.to_csv(buffer, index=index)
+    return buffer.getvalue()
+
+@st.cache_data(ttl=600, show_spinner="📄 Reading member list...")  # Only on a cache miss, and only if slow
+def parse_members_csv(file_bytes, nrows=None):
+    """Parse an uploaded member list, cached by content so reruns don't re-parse"""
+    # Read only the member columns, as text, without dtype sniffing
+    return pd.read_csv(
+        io.BytesIO(file_bytes),
+        nrows=nrows,
+        dtype=str,
+        usecols=lambda column: column in MEMBER_HEADERS,
+        keep_default_na=False
+    )
+
+def compute_distinct_counts(df):
+    """Distinct Sundays, members and groups in one call"""
+    return df[["Date", "Full Name", "Group"]].nunique()
+
+def compute_recent_trend(df):
+    """Attendance per Sunday over the last 8 weeks"""
+    recent_data = df[df["Date"] >= (datetime.now() - timedelta(weeks=8))]
+    return recent_data.groupby("Date").size().reset_index(name="Attendance")
+
+def compute_group_totals(df):
+    """Total attendance per group"""
+    return df.groupby("Group", observed=True).size().reset_index(name="Total_Attendance")
+
+def compute_weekly_trend(df):
+    """Attendance count per week"""
+    # Bucket on the datetime values; only the surviving weeks become Periods
+    weekly_data = df.resample("W", on="Date").size()
+    weekly_data = weekly_data[weekly_data > 0]
+    weekly_data.index = weekly_data.index.to_period("W")
+    return pd.DataFrame({
+        "Week": weekly_data.index.astype(str),
+        "Attendance": weekly_data.values
+    })
+
+def compute_group_stats(df):
+    """Attendance totals, distinct members and active Sundays per group"""
+    # Named aggregations over a single grouping of the categorical codes
+    group_stats = df.groupby("Group", observed=True).agg(
+        Total_Attendance=("Full Name", "count"),
+        Unique_Members=("Full Name", "nunique"),
+        Sundays_Active=("Date", "nunique")
+    )
+    group_stats["Avg_per_Sunday"] = (group_stats["Total_Attendance"] / group_stats["Sundays_Active"]).round(1)
+    return group_stats
+
+def compute_top_members(df):
+    """The 10 members with the most attendance records"""
+    member_stats = df.groupby("Full Name", observed=True).agg(
+        Total_Attendance=("Date", "count"),
+        Unique_Sundays=("Date", "nunique"),
+        Group=("Group", "first")
+    )
+    
+    # Partial selection of the top rows instead of sorting every member
+    return member_stats.nlargest(10, "Total_Attendance").reset_index()
+
+def compute_monthly_pivot(df):
+    """Attendance per month and group, with a total column"""
+    month = df["Date"].dt.to_period("M").rename("Month")
+    monthly_stats = df.groupby([month, "Group"], observed=True).size().unstack(fill_value=0)
+    monthly_stats["Total"] = monthly_stats.sum(axis=1)
+    return monthly_stats
+
+def chart_recent_trend(df):
+    """Line chart of the last 8 weeks, or None with fewer than two Sundays"""
+    weekly_trend = compute_recent_trend(df)
+    if len(weekly_trend) <= 1:
+        return None
+    
+    fig = px.line(
+        weekly_trend,
+        x="Date",
+        y="Attendance",
+        markers=True,
+        title="Weekly Attendance Trend (Last 8 Weeks)"
+    )
+    fig.update_layout(height=400)
+    return fig
+
+def chart_group_totals(df):
+    """Bar chart of total attendance per group"""
+    fig = px.bar(
+        compute_group_totals(df),
+        x="Group",
+        y="Total_Attendance",
+        title="Total Attendance by Group",
+        color="Total_Attendance",
+        color_continuous_scale="blues"
+    )
+    fig.update_layout(height=400)
+    return fig
+
+def chart_weekly_trend(df):
+    """Line chart of the whole history by week, or None without data"""
+    weekly_df = compute_weekly_trend(df)
+    if len(weekly_df) == 0:
+        return None
+    
+    return px.line(
+        weekly_df,
+        x="Week",
+        y="Attendance",
+        markers=True,
+        render_mode="webgl",  # One point per week of the whole history
+        title="Weekly Attendance Trend"
+    )
+
+def chart_group_averages(df):
+    """Bar chart of average attendance per Sunday for each group"""
+    return px.bar(
+        compute_group_stats(df).reset_index(),
+        x="Group",
+        y="Avg_per_Sunday",
+        title="Average Attendance per Sunday",
+        color="Avg_per_Sunday"
+    )
+
 def show_setup_instructions():
     """Show Google Sheets setup instructions"""
     st.markdown("## 🔧 Google Sheets Setup Instructions")
@@ -440,9 +1014,11 @@ def show_setup_instructions():
         
         ### 5. Rate Limiting Information
         - The app now includes automatic rate limiting
-        - API calls are delayed by 1-2 seconds to prevent quota issues
+        - Quota (429) and temporary server errors are retried with increasing waits
         - Data is cached for 5 minutes to reduce API calls
         - Batch operations are used for large data updates
+        - Saving attendance only rewrites the rows for that Sunday and group
+        - Saving members only writes the rows that changed
         """)
 
 sheets = get_sheets_manager()
@@ -454,7 +1030,7 @@ def add_cache_controls():
     st.sidebar.markdown("### 🔄 Cache Controls")
     
     if st.sidebar.button("🗑️ Clear Cache"):
-        sheets._cache.clear()
+        sheets.clear_cache()
         st.sidebar.success("Cache cleared!")
     
     cache_info = f"📝 Cached items: {len(sheets._cache)}"
@@ -492,22 +1068,6 @@ def main_app():
     # Add cache controls
     add_cache_controls()
     
-    # Sidebar stats
-    st.sidebar.markdown("---")
-    st.sidebar.markdown("### ☁️ Cloud Stats")
-    
-    try:
-        stats = sheets.get_stats()
-        st.sidebar.metric("📋 Total Records", stats.get('total_attendance', 0))
-        st.sidebar.metric("📅 Sundays Tracked", stats.get('unique_dates', 0))
-        st.sidebar.metric("👥 Total Members", stats.get('total_members', 0))
-        st.sidebar.success("✅ Google Sheets Connected")
-        
-        if stats.get('spreadsheet_url'):
-            st.sidebar.markdown(f"[📊 View Spreadsheet]({stats['spreadsheet_url']})")
-    except:
-        st.sidebar.error("❌ Loading stats...")
-    
     # Route to pages
     if page == "🏠 Dashboard":
         dashboard_home()
@@ -521,76 +1081,76 @@ def main_app():
         reports_page()
     elif page == "⚙️ Admin Panel":
         admin_page()
+    
+    # Sidebar stats (after the page, so they reuse whatever it loaded)
+    with st.sidebar:
+        sidebar_stats()
+
+@st.fragment(run_every=60)
+def sidebar_stats():
+    """Cloud stats in the sidebar; refreshes on its own without rerunning the page"""
+    st.markdown("---")
+    st.markdown("### ☁️ Cloud Stats")
+    
+    try:
+        stats = sheets.get_stats()
+        st.metric("📋 Total Records", stats.get('total_attendance', 0))
+        st.metric("📅 Sundays Tracked", stats.get('unique_dates', 0))
+        st.metric("👥 Total Members", stats.get('total_members', 0))
+        st.success("✅ Google Sheets Connected")
+        
+        if stats.get('spreadsheet_url'):
+            st.markdown(f"[📊 View Spreadsheet]({stats['spreadsheet_url']})")
+    except:
+        st.error("❌ Loading stats...")
 
 def dashboard_home():
     st.markdown('<div class="main-header">🏠 Dashboard Overview</div>', unsafe_allow_html=True)
     
     # Load data from Google Sheets with caching
-    df = sheets.load_attendance()
-    members_df = sheets.load_members()
+    members_df, df = sheets.load_all()
     
     if df.empty:
         st.info("👋 Welcome! No attendance data yet. Start by uploading member data and marking attendance!")
         return
     
-    # Prepare data
-    df["Date"] = pd.to_datetime(df["Date"])
-    
     # Key Metrics
     st.markdown("### 📊 Key Metrics")
     col1, col2, col3, col4, col5 = st.columns(5)
     
+    unique_counts = sheets.get_attendance_summary(compute_distinct_counts)
+    sundays = unique_counts["Date"]
+    
     with col1:
         st.metric("📋 Total Attendance", f"{len(df):,}")
     with col2:
-        st.metric("📅 Sundays Tracked", df["Date"].nunique())
+        st.metric("📅 Sundays Tracked", sundays)
     with col3:
-        st.metric("👥 Active Members", df["Full Name"].nunique())
+        st.metric("👥 Active Members", unique_counts["Full Name"])
     with col4:
-        st.metric("📂 Active Groups", df["Group"].nunique())
+        st.metric("📂 Active Groups", unique_counts["Group"])
     with col5:
-        sundays = df["Date"].nunique()
         avg_attendance = len(df) / sundays if sundays > 0 else 0
         st.metric("📈 Avg per Sunday", f"{avg_attendance:.1f}")
     
     # Attendance Trend
     st.markdown("### 📈 Attendance Trend")
     
-    recent_data = df[df["Date"] >= (datetime.now() - timedelta(weeks=8))]
-    weekly_trend = recent_data.groupby("Date").size().reset_index(name="Attendance")
-    
-    if len(weekly_trend) > 1:
-        fig = px.line(
-            weekly_trend,
-            x="Date",
-            y="Attendance",
-            markers=True,
-            title="Weekly Attendance Trend (Last 8 Weeks)"
-        )
-        fig.update_layout(height=400)
+    # Figures are built once per loaded frame, not on every rerun
+    fig = sheets.get_attendance_summary(chart_recent_trend)
+    if fig is not None:
         st.plotly_chart(fig, use_container_width=True)
     
     # Group Performance
     st.markdown("### 👥 Group Performance")
     
-    group_stats = df.groupby("Group").size().reset_index(name="Total_Attendance")
-    
-    fig = px.bar(
-        group_stats,
-        x="Group",
-        y="Total_Attendance",
-        title="Total Attendance by Group",
-        color="Total_Attendance",
-        color_continuous_scale="blues"
-    )
-    fig.update_layout(height=400)
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(sheets.get_attendance_summary(chart_group_totals), use_container_width=True)
 
 def attendance_page():
     st.markdown('<div class="main-header">✓ Mark Attendance</div>', unsafe_allow_html=True)
     
-    # Check for members
-    members_df = sheets.load_members()
+    # Check for members (attendance is fetched alongside for existing records)
+    members_df, _ = sheets.load_all()
     if members_df.empty:
         st.warning("⚠️ No members found. Please upload member data in the Admin Panel first.")
         return
@@ -603,11 +1163,11 @@ def attendance_page():
         sunday_str = sunday.strftime("%Y-%m-%d")
     
     with col2:
-        available_groups = sorted(members_df["Group"].dropna().unique())
-        group = st.selectbox("👥 Select Group", available_groups)
+        members_by_group = sheets.get_members_by_group()
+        group = st.selectbox("👥 Select Group", list(members_by_group))
     
     # Group information
-    group_df = members_df[members_df["Group"] == group].copy()
+    group_df = members_by_group.get(group, members_df.iloc[0:0])
     st.info(f"📊 **{group}** has **{len(group_df)}** members total")
     
     # Check for existing attendance
@@ -620,6 +1180,11 @@ def attendance_page():
         </div>
         """, unsafe_allow_html=True)
     
+    attendance_form(group_df, sunday_str, group, existing_attendance)
+
+@st.fragment
+def attendance_form(group_df, sunday_str, group, existing_attendance):
+    """Member selection and submit for one group; reruns on its own when edited"""
     # Member selection
     st.markdown("### 👤 Select Present Members")
     
@@ -636,7 +1201,9 @@ def attendance_page():
             st.error("⚠️ Please select at least one member as present.")
             return
         
-        present_df = group_df[group_df["Full Name"].isin(present)].copy()
+        # Gather the selected rows by precomputed position; save_attendance only reads them
+        positions = sheets.get_member_positions(group, group_df)
+        present_df = group_df.iloc[[i for name in present for i in positions.get(name, [])]]
         
         if sheets.save_attendance(present_df, sunday_str, group):
             st.markdown(f"""
@@ -656,8 +1223,11 @@ def history_page():
         st.info("📝 No attendance records found.")
         return
     
-    df["Date"] = pd.to_datetime(df["Date"])
-    
+    history_records(df)
+
+@st.fragment
+def history_records(df):
+    """Filters and the records table; reruns on its own when a filter changes"""
     # Basic filters
     col1, col2 = st.columns(2)
     
@@ -679,7 +1249,7 @@ def history_page():
         month_ago = datetime.now() - timedelta(days=30)
         filtered_df = df[df["Date"] >= month_ago]
     else:
-        filtered_df = df.copy()
+        filtered_df = df
     
     if selected_group != "All Groups":
         filtered_df = filtered_df[filtered_df["Group"] == selected_group]
@@ -688,12 +1258,16 @@ def history_page():
     st.markdown("### 📋 Records")
     
     if not filtered_df.empty:
-        display_df = filtered_df.copy()
-        display_df["Date"] = display_df["Date"].dt.strftime("%Y-%m-%d")
-        st.dataframe(display_df, use_container_width=True, hide_index=True)
+        # Format dates at render time instead of copying the frame to strings
+        st.dataframe(
+            filtered_df,
+            use_container_width=True,
+            hide_index=True,
+            column_config={"Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD")}
+        )
         
         # Export option
-        csv_data = filtered_df.to_csv(index=False)
+        csv_data = to_csv_bytes(filtered_df)
         st.download_button(
             "📄 Download as CSV",
             csv_data,
@@ -711,56 +1285,30 @@ def analytics_page():
         st.info("📈 No data available for analytics.")
         return
     
-    df["Date"] = pd.to_datetime(df["Date"])
-    
     # Analytics tabs
     tab1, tab2, tab3 = st.tabs(["📈 Trends", "👥 Groups", "🎯 Members"])
     
     with tab1:
         st.markdown("#### 📈 Attendance Trends")
         
-        weekly_data = df.groupby(df["Date"].dt.to_period("W")).size()
-        weekly_df = pd.DataFrame({
-            "Week": weekly_data.index.astype(str),
-            "Attendance": weekly_data.values
-        })
-        
-        if len(weekly_df) > 0:
-            fig = px.line(
-                weekly_df,
-                x="Week",
-                y="Attendance",
-                markers=True,
-                title="Weekly Attendance Trend"
-            )
+        fig = sheets.get_attendance_summary(chart_weekly_trend)
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
     
     with tab2:
         st.markdown("#### 👥 Group Analysis")
         
-        group_stats = df.groupby("Group").agg({
-            "Full Name": ["count", "nunique"],
-            "Date": "nunique"
-        })
-        
-        group_stats.columns = ["Total_Attendance", "Unique_Members", "Sundays_Active"]
-        group_stats["Avg_per_Sunday"] = (group_stats["Total_Attendance"] / group_stats["Sundays_Active"]).round(1)
+        group_stats = sheets.get_attendance_summary(compute_group_stats)
         
         st.dataframe(group_stats, use_container_width=True)
     
     with tab3:
         st.markdown("#### 🎯 Member Engagement")
         
-        member_stats = df.groupby("Full Name").agg({
-            "Date": ["count", "nunique"],
-            "Group": "first"
-        })
-        
-        member_stats.columns = ["Total_Attendance", "Unique_Sundays", "Group"]
-        member_stats = member_stats.reset_index().sort_values("Total_Attendance", ascending=False)
+        top_members = sheets.get_attendance_summary(compute_top_members)
         
         st.markdown("**🏆 Top 10 Most Active Members**")
-        st.dataframe(member_stats.head(10), use_container_width=True, hide_index=True)
+        st.dataframe(top_members, use_container_width=True, hide_index=True)
 
 def reports_page():
     st.markdown('<div class="main-header">📈 Detailed Reports</div>', unsafe_allow_html=True)
@@ -770,8 +1318,6 @@ def reports_page():
         st.info("📊 No attendance data available for reports.")
         return
     
-    df["Date"] = pd.to_datetime(df["Date"])
-    
     # Report selector
     report_type = st.selectbox(
         "📋 Select Report Type",
@@ -786,14 +1332,12 @@ def reports_page():
     if report_type == "📅 Monthly Summary":
         st.markdown("### 📅 Monthly Summary Report")
         
-        df["Month"] = df["Date"].dt.to_period("M")
-        monthly_stats = df.groupby(["Month", "Group"]).size().unstack(fill_value=0)
-        monthly_stats["Total"] = monthly_stats.sum(axis=1)
+        monthly_stats = sheets.get_attendance_summary(compute_monthly_pivot)
         
         st.dataframe(monthly_stats, use_container_width=True)
         
         # Export
-        csv_data = monthly_stats.to_csv()
+        csv_data = to_csv_bytes(monthly_stats, index=True)
         st.download_button(
             "📥 Download Report",
             csv_data,
@@ -804,25 +1348,64 @@ def reports_page():
     elif report_type == "👥 Group Performance":
         st.markdown("### 👥 Group Performance Report")
         
-        group_analysis = df.groupby("Group").agg({
-            "Full Name": ["count", "nunique"],
-            "Date": "nunique"
-        })
-        
-        group_analysis.columns = ["Total_Attendance", "Active_Members", "Sundays_Active"]
-        group_analysis["Avg_per_Sunday"] = (group_analysis["Total_Attendance"] / group_analysis["Sundays_Active"]).round(1)
+        group_analysis = sheets.get_attendance_summary(compute_group_stats).rename(
+            columns={"Unique_Members": "Active_Members"}
+        )
         
         st.dataframe(group_analysis, use_container_width=True)
         
         # Visualization
-        fig = px.bar(
-            group_analysis.reset_index(),
-            x="Group",
-            y="Avg_per_Sunday",
-            title="Average Attendance per Sunday",
-            color="Avg_per_Sunday"
-        )
-        st.plotly_chart(fig, use_container_width=True)
+        st.plotly_chart(sheets.get_attendance_summary(chart_group_averages), use_container_width=True)
+
+@st.fragment
+def sheets_status():
+    """Connection, quota and cache status; refreshes without rerunning the admin page"""
+    st.markdown("### ☁️ Google Sheets Status")
+    
+    if sheets.is_connected():
+        st.success("✅ Connected to Google Sheets")
+        
+        stats = sheets.get_stats()
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric("👥 Members", stats.get('total_members', 0))
+        with col2:
+            st.metric("📋 Records", stats.get('total_attendance', 0))
+        with col3:
+            st.metric("📅 Dates", stats.get('unique_dates', 0))
+        
+        if stats.get('spreadsheet_url'):
+            st.markdown(f"**📊 Spreadsheet:** [Open in Google Sheets]({stats['spreadsheet_url']})")
+            
+        # Rate limiting status
+        st.markdown("### ⚙️ Rate Limiting Status")
+        
+        bucket = sheets.get_bucket_state()
+        
+        hits, misses = sheets._cache_stats['hits'], sheets._cache_stats['misses']
+        lookups = hits + misses
+        
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            st.metric("🪙 Tokens available", f"{bucket['tokens']:.0f}")
+        with col2:
+            st.metric("⏱️ Estimated wait (s)", f"{bucket['wait']:.1f}")
+        with col3:
+            cache_items = len(sheets._cache)
+            st.metric("💾 Cached data items", cache_items)
+        with col4:
+            st.metric("🎯 Cache hits", f"{hits}/{lookups} ({100 * hits / max(1, lookups):.0f}%)")
+        
+        # Manual refresh button
+        if st.button("🔄 Force Refresh Data", help="Clear cache and reload all data"):
+            sheets.clear_cache()
+            st.success("Cache cleared! Data will be refreshed on next load.")
+            st.rerun(scope="fragment")
+            
+    else:
+        st.error("❌ Not connected to Google Sheets")
+        show_setup_instructions()
 
 def admin_page():
     st.markdown('<div class="main-header">⚙️ Admin Panel</div>', unsafe_allow_html=True)
@@ -839,7 +1422,7 @@ def admin_page():
             st.dataframe(members_df, use_container_width=True, hide_index=True)
             
             # Download
-            csv_data = members_df.to_csv(index=False)
+            csv_data = to_csv_bytes(members_df)
             st.download_button(
                 "📥 Download Member List",
                 csv_data,
@@ -857,69 +1440,43 @@ def admin_page():
         
         if uploaded_file:
             try:
-                new_df = pd.read_csv(uploaded_file)
-                st.dataframe(new_df.head(10), use_container_width=True)
+                # Validate from the header row alone before parsing any data
+                file_bytes = uploaded_file.getvalue()
+                header = parse_members_csv(file_bytes, nrows=0).columns
                 
                 required_cols = ["Membership Number", "Full Name", "Group"]
-                missing_cols = [col for col in required_cols if col not in new_df.columns]
+                missing_cols = sorted(set(required_cols).difference(header))
                 
                 if missing_cols:
                     st.error(f"❌ Missing columns: {', '.join(missing_cols)}")
                 else:
+                    # Preview from the first rows only
+                    preview_df = parse_members_csv(file_bytes, nrows=10)
+                    st.dataframe(preview_df, use_container_width=True)
                     st.success("✅ File format looks good!")
                     
                     if st.button("☁️ Save to Google Sheets", type="primary"):
+                        # Parse the whole file only when it is actually saved
+                        new_df = parse_members_csv(file_bytes)
+                        
+                        # The save keeps only the last row per number, so say which were repeated
+                        numbers = new_df['Membership Number'].str.strip()
+                        dup = numbers.duplicated(keep=False) & (numbers != '')
+                        if dup.any():
+                            st.warning(f"⚠️ Duplicate membership numbers (last row kept): {', '.join(numbers[dup].unique())}")
+                        
                         if sheets.save_members(new_df):
                             st.success("🎉 Members saved successfully!")
                             st.balloons()
-                            st.rerun()
+                            if not dup.any():
+                                st.rerun()  # A rerun would clear the duplicate warning
                         else:
                             st.error("❌ Failed to save members.")
             except Exception as e:
                 st.error(f"❌ Error: {str(e)}")
     
     with tab2:
-        st.markdown("### ☁️ Google Sheets Status")
-        
-        stats = sheets.get_stats()
-        
-        if sheets.is_connected():
-            st.success("✅ Connected to Google Sheets")
-            
-            col1, col2, col3 = st.columns(3)
-            with col1:
-                st.metric("👥 Members", stats.get('total_members', 0))
-            with col2:
-                st.metric("📋 Records", stats.get('total_attendance', 0))
-            with col3:
-                st.metric("📅 Dates", stats.get('unique_dates', 0))
-            
-            if stats.get('spreadsheet_url'):
-                st.markdown(f"**📊 Spreadsheet:** [Open in Google Sheets]({stats['spreadsheet_url']})")
-                
-            # Rate limiting status
-            st.markdown("### ⚙️ Rate Limiting Status")
-            
-            current_time = time.time()
-            last_call = getattr(sheets, '_last_api_call', 0)
-            time_since_last = current_time - last_call
-            
-            col1, col2 = st.columns(2)
-            with col1:
-                st.metric("⏱️ Seconds since last API call", f"{time_since_last:.1f}")
-            with col2:
-                cache_items = len(sheets._cache)
-                st.metric("💾 Cached data items", cache_items)
-            
-            # Manual refresh button
-            if st.button("🔄 Force Refresh Data", help="Clear cache and reload all data"):
-                sheets._cache.clear()
-                st.success("Cache cleared! Data will be refreshed on next load.")
-                st.rerun()
-                
-        else:
-            st.error("❌ Not connected to Google Sheets")
-            show_setup_instructions()
+        sheets_status()
 
 if __name__ == "__main__":
     main_app()
\ No newline at end of file